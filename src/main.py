@@ -4,66 +4,569 @@ txAdmin Recipe Processor
 Processes txAdminRecipe.yaml files and replicates the folder structure locally
 """
 
+import io
 import os
 import sys
+import mmap
+import errno
+import socket
 import yaml
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 import zipfile
+import tarfile
 import shutil
+import posixpath
 import argparse
 import subprocess
 import tempfile
 import time
 import re
+import json
+import hashlib
+import threading
+import functools
+import contextlib
+import dataclasses
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from urllib.parse import urlparse
-from typing import Dict, List, Any, Optional
+from urllib.parse import ParseResult, urlparse, quote
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Optional: libgit2 bindings let branch clones run in-process instead of spawning git
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+# Prefer the libyaml C parser; the pure-Python loader is much slower
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# Lines holding txAdmin variables ($engine, $onesync, ...) aren't valid YAML
+DOLLAR_LINE_RE = re.compile(rb'(?m)^[ \t]*\$[^\n]*\n?')
+
+# ioctl request number for FICLONE (reflink a whole file on btrfs/XFS)
+FICLONE = 0x40049409
+
+# Block size for streaming copies (large blocks keep per-chunk Python overhead negligible)
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Archives streamed straight into extraction stay in memory up to this size
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+# Per-member copy size when extracting archives
+ZIP_COPY_BUFFER_SIZE = 256 * 1024
+
+# Characters zipfile replaces in member names when extracting on Windows
+WINDOWS_ILLEGAL_NAME_CHARS = str.maketrans(':<>|"?*', '_' * 7)
+
+# Archives with fewer members aren't worth spreading over a thread pool
+PARALLEL_EXTRACT_MIN_MEMBERS = 32
+
+# Pipeline progress is written in batches: at most this often, or once this many lines queue up
+PROGRESS_FLUSH_INTERVAL = 0.25
+PROGRESS_FLUSH_LINES = 64
+
+# Temp directories are named after the owning process so stale ones can be swept
+TEMP_DIR_RE = re.compile(r'\A\.txrecipe_(\d+)_')
+
+# Upper bound in seconds for a single git operation, CLI or in-process
+GIT_TIMEOUT = 300
+
+# Per-user cache shared between runs
+CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'txrecipe'
+MIRROR_DIR = CACHE_DIR / 'mirrors'
+RECIPE_CACHE_DIR = CACHE_DIR / 'recipes'
+
+# GitHub serves any ref as a gzipped tarball of just the tree, without git history
+GITHUB_HOSTS = ('github.com', 'www.github.com')
+CODELOAD_URL = 'https://codeload.github.com/{owner}/{repo}/tar.gz/{ref}'
+
+# Archives apply .gitattributes export rules; a line setting one means the tarball
+# would differ from a checkout (unset/negated attributes don't match)
+EXPORT_ATTR_RE = re.compile(rb'(?m)^[^#\n]*(?<![-!\w])export-(?:ignore|subst)\b')
+
+# Abbreviated (7+) through full (40) hex commit SHAs
+SHA_RE = re.compile(r'\A[0-9a-fA-F]{7,40}\Z')
+
+# Path components that belong to the category structure rather than a resource
+BRACKET_RE = re.compile(r'\[.*\]')
+STANDARD_DIRS = frozenset(('resources', 'tmp'))
+
+@functools.lru_cache(maxsize=1024)
+def _dry_run_parent_parts(parts: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Leading path components made of [bracket] folders or standard paths"""
+    parent_parts = []
+    for part in parts:
+        # Stop at the first part that is likely the resource folder name
+        if BRACKET_RE.search(part) or part in STANDARD_DIRS or part[:2] == './':
+            parent_parts.append(part)
+        else:
+            break
+    return tuple(parent_parts)
+
+@functools.lru_cache(maxsize=1024)
+def _parse_url(url: str) -> ParseResult:
+    """urlparse, memoized for URLs a recipe references more than once"""
+    return urlparse(url)
+
+def _normalize_subpath(subpath: str) -> str:
+    """Canonical form of a repository subpath ('./res//a' -> 'res/a'; '' for the root)"""
+    prefix = posixpath.normpath(subpath).lstrip('/')
+    return '' if prefix == '.' else prefix
+
+# Copy buffers are reused per thread instead of allocating a new bytes object per read
+_thread_buffers = threading.local()
+
+def _copy_stream(src, dst, length: int = COPY_BUFFER_SIZE):
+    """Copy a file object to another through this thread's reusable buffer.
+    Only for sources whose readinto() respects the buffer size (files, archive members)."""
+    buffers = _thread_buffers.__dict__
+    view = buffers.get(length)
+    if view is None:
+        view = buffers[length] = memoryview(bytearray(length))
+    while True:
+        n = src.readinto(view)
+        if not n:
+            break
+        dst.write(view[:n])
+
+class _MappedReader(io.RawIOBase):
+    """Seekable read-only file over a shared buffer such as an mmap.
+    Each reader keeps its own position, so threads can share one mapping without copying it."""
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer)
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+    
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+    
+    def close(self):
+        # Release the view so the underlying mmap can be closed
+        self._view.release()
+        super().close()
+
+@dataclasses.dataclass
+class PlannedTask:
+    """A recipe task read once up front, with its output paths already resolved.
+    The string fields keep the recipe's values for messages; *_path are None when unset."""
+    action: str
+    src: str = ''
+    dest: str = ''
+    path: str = ''
+    url: str = ''
+    ref: str = 'main'
+    subpath: str = ''
+    overwrite: bool = False
+    seconds: float = 0
+    src_path: Optional[Path] = None
+    dest_path: Optional[Path] = None
+    target_path: Optional[Path] = None
 
 class TxAdminRecipeProcessor:
-    def __init__(self, recipe_file: str, output_dir: str, verbose: bool = False, dry_run: bool = False):
+    # Network-bound actions that may run concurrently with each other
+    PARALLEL_ACTIONS = ('download_github', 'download_file', 'download_unzip')
+    # CPU-bound actions that get their own pool so they overlap with downloads
+    EXTRACT_ACTIONS = ('unzip',)
+    # Database actions need a live server and are skipped locally
+    SKIPPED_ACTIONS = frozenset(('connect_database', 'query_database'))
+    
+    def __init__(self, recipe_file: str, output_dir: str, verbose: bool = False, dry_run: bool = False,
+                 jobs: int = 8, mirror_cache: bool = False):
         self.recipe_file = recipe_file
         self.output_dir = Path(output_dir).resolve()
         self.verbose = verbose
         self.dry_run = dry_run
+        self.jobs = max(1, jobs)
+        self.mirror_cache = mirror_cache
         self.temp_dir = None
+        self._log_lock = threading.Lock()
+        self._mirror_locks: Dict[str, threading.Lock] = {}
+        self._mirror_locks_guard = threading.Lock()
+        self._fresh_mirrors = set()
+        self._known_dirs: Set[Path] = set()
+        self._known_dirs_lock = threading.Lock()
+        # Set on Ctrl+C so waiting and downloading tasks stop early
+        self._cancelled = threading.Event()
+        self._responses: Set[requests.Response] = set()
+        self._responses_lock = threading.Lock()
+        # When the last network action finished; waste_time only waits out the rest
+        self._last_throttled_action = 0.0
+        
+        # One HTTP session for every download so requests to the same host reuse
+        # keep-alive connections; the pool is sized for parallel downloads (see --jobs)
+        self.session = requests.Session()
+        http_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(32, self.jobs))
+        self.session.mount('https://', http_adapter)
+        self.session.mount('http://', http_adapter)
+        
+        # Map actions to their processors
+        self._action_map = {
+            'download_github': self.process_download_github,
+            'download_file': self.process_download_file,
+            'download_unzip': self.process_download_unzip,
+            'unzip': self.process_unzip,
+            'move_path': self.process_move_path,
+            'remove_path': self.process_remove_path,
+            'waste_time': self.process_waste_time,
+        }
+        
+        # Fail fast instead of hanging on credential prompts for private/missing repos
+        self.git_env = {
+            **os.environ,
+            'GIT_TERMINAL_PROMPT': '0',
+            'GIT_CONFIG_COUNT': '2',
+            'GIT_CONFIG_KEY_0': 'protocol.version',
+            'GIT_CONFIG_VALUE_0': '2',
+            # Checkouts of fetched commits are always detached; skip the advice in verbose output
+            'GIT_CONFIG_KEY_1': 'advice.detachedHead',
+            'GIT_CONFIG_VALUE_1': 'false',
+        }
         
         # Create output directory if it doesn't exist
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Create temp directory for downloads (not needed in dry-run mode)
+        # Create temp directory for downloads (not needed in dry-run mode).
+        # It lives inside output_dir so moving results into place is a same-filesystem rename.
         if not self.dry_run:
-            self.temp_dir = Path(tempfile.mkdtemp(prefix="txrecipe_"))
+            self._remove_stale_temp_dirs()
+            self.temp_dir = Path(tempfile.mkdtemp(prefix=f".txrecipe_{os.getpid()}_", dir=self.output_dir))
         else:
             self.temp_dir = None
         
+    def _remove_stale_temp_dirs(self):
+        """Remove temp directories left in output_dir by runs that were killed"""
+        # Signal 0 only probes for liveness on POSIX; on Windows os.kill terminates
+        if os.name != 'posix':
+            return
+        for entry in os.scandir(self.output_dir):
+            match = TEMP_DIR_RE.match(entry.name)
+            if not match or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                os.kill(int(match.group(1)), 0)
+                continue  # Owner is still running
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            self.log(f"Removed stale temporary directory: {entry.path}")
+    
     def log(self, message: str, level: str = "INFO"):
         """Log messages with optional verbosity"""
         prefix = "[DRY-RUN] " if self.dry_run else ""
         if self.verbose or level in ["ERROR", "WARNING"]:
-            print(f"{prefix}[{level}] {message}")
+            with self._log_lock:
+                print(f"{prefix}[{level}] {message}")
     
     def _should_create_in_dry_run(self, path: Path) -> Path:
         """Determine the parent folder structure that should be created in dry-run mode.
         Only creates folders with [brackets], not the final resource folder."""
-        parts = path.parts
-        parent_parts = []
-        
-        for part in parts:
-            # Include all parts up to but not including the final resource name
-            # Only include parts that contain brackets or are standard paths
-            if '[' in part and ']' in part:
-                parent_parts.append(part)
-            elif part in ['resources', 'tmp'] or part.startswith('./'):
-                parent_parts.append(part)
-            else:
-                # This is likely the resource folder name - don't include it
-                break
-        
+        parent_parts = _dry_run_parent_parts(path.parts)
         return Path(*parent_parts) if parent_parts else Path()
     
     def _is_commit_hash(self, ref: str) -> bool:
         """Check if a ref looks like a commit hash (SHA)."""
-        return len(ref) >= 7 and re.match(r'^[a-f0-9]+$', ref.lower()) is not None
+        return SHA_RE.match(ref) is not None
+    
+    def _run_git(self, args: List[str], cwd: Optional[Path] = None,
+                 timeout: int = GIT_TIMEOUT) -> subprocess.CompletedProcess:
+        """Run a git command without ever waiting on interactive auth prompts.
+        Output is discarded; stderr is only decoded when the command fails.
+        In verbose mode git's stderr (progress included) goes straight to the terminal."""
+        if self.verbose:
+            # Only network commands have progress worth showing; keep the rest quiet
+            if args[0] in ('clone', 'fetch'):
+                args = [arg for arg in args if arg != '--quiet']
+            result = subprocess.run(['git', *args], cwd=cwd, env=self.git_env,
+                                    stdout=subprocess.DEVNULL, timeout=timeout)
+            result.stderr = 'see git output above' if result.returncode != 0 else ''
+            return result
+        
+        result = subprocess.run(['git', *args], cwd=cwd, env=self.git_env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+        result.stderr = result.stderr.decode(errors='replace') if result.returncode != 0 else ''
+        return result
+    
+    def _clone_commit(self, src: str, ref: str,
+                      clone_dir: Path) -> Optional[subprocess.CompletedProcess]:
+        """Check out a single commit into clone_dir without downloading the repository history.
+        Returns the last git result, or None if the commit could not be checked out."""
+        # Full SHAs can be fetched directly; servers won't resolve abbreviated ones
+        if len(ref) == 40:
+            self.log(f"Detected commit hash, fetching single commit...")
+            for args in (['init', '--quiet'],
+                         ['remote', 'add', 'origin', src],
+                         ['fetch', '--quiet', '--depth', '1', 'origin', ref],
+                         ['checkout', '--quiet', 'FETCH_HEAD']):
+                result = self._run_git(args, cwd=clone_dir)
+                if result.returncode != 0:
+                    break
+            else:
+                return result
+            
+            self.log(f"Fetching commit {ref} failed, falling back to partial clone...")
+            shutil.rmtree(clone_dir)
+            clone_dir.mkdir()
+        else:
+            self.log(f"Detected abbreviated commit hash, cloning without file history...")
+        
+        # Blobless clone: full commit graph to resolve the SHA, but only the blobs it needs
+        result = self._run_git(['clone', '--quiet', '--filter=blob:none', '--no-checkout',
+                                src, str(clone_dir)])
+        if result.returncode == 0:
+            checkout_result = self._run_git(['checkout', '--quiet', ref], cwd=clone_dir)
+            if checkout_result.returncode != 0:
+                self.log(f"Failed to checkout {ref}: {checkout_result.stderr}", "ERROR")
+                return None
+        return result
+    
+    def _clone_ref(self, src: str, ref: str, clone_dir: Path, subpath: str = '') -> bool:
+        """Check out ref of src into clone_dir, logging the reason on failure.
+        When subpath is given, strategies that can may skip everything outside it."""
+        if self.mirror_cache and self._checkout_from_mirror(src, ref, clone_dir):
+            return True
+        
+        if self._download_tarball(src, ref, clone_dir, subpath):
+            return True
+        if self._cancelled.is_set():
+            return False
+        
+        # Determine the best cloning strategy based on ref type
+        if self._is_commit_hash(ref):
+            result = self._clone_commit(src, ref, clone_dir)
+            if result is None:
+                return False
+        else:
+            # For branch names, try shallow clone first
+            self.log(f"Attempting shallow clone of branch '{ref}'...")
+            if pygit2 is not None and self._clone_branch_in_process(src, ref, clone_dir):
+                return True
+            
+            result = self._run_git(['clone', '--quiet', '--depth', '1', '--single-branch', '--branch', ref,
+                                    src, str(clone_dir)])
+            
+            if result.returncode != 0:
+                # Fallback: blobless clone of the default branch, then fetch the ref on its own
+                # (covers refs --branch can't name); blobs are only downloaded for the checkout
+                self.log(f"Shallow clone failed, trying default branch...")
+                result = self._run_git(['clone', '--quiet', '--depth', '1', '--no-checkout', '--filter=blob:none',
+                                        src, str(clone_dir)])
+                
+                if result.returncode == 0:
+                    target = 'HEAD'
+                    if ref not in ['main', 'master']:
+                        fetch_result = self._run_git(['fetch', '--quiet', '--depth', '1', 'origin', ref],
+                                                     cwd=clone_dir)
+                        if fetch_result.returncode == 0:
+                            target = 'FETCH_HEAD'
+                        else:
+                            self.log(f"Warning: Could not fetch '{ref}', using default branch", "WARNING")
+                    result = self._run_git(['checkout', '--quiet', target], cwd=clone_dir)
+        
+        if result.returncode != 0:
+            self.log(f"Failed to clone repository {src}: {result.stderr}", "ERROR")
+            return False
+        return True
+    
+    def _mirror_lock(self, src: str) -> threading.Lock:
+        """Lock serializing access to the cached mirror of src"""
+        with self._mirror_locks_guard:
+            return self._mirror_locks.setdefault(src, threading.Lock())
+    
+    def _checkout_from_mirror(self, src: str, ref: str, clone_dir: Path) -> bool:
+        """Export ref from a bare mirror of src kept in the user cache.
+        The first use clones the mirror; later uses only fetch new objects, and commits
+        already in the mirror need no network at all. The export contains no .git."""
+        mirror = MIRROR_DIR / hashlib.sha1(src.encode()).hexdigest()
+        
+        with self._mirror_lock(src):
+            commit = f"{ref}^{{commit}}"
+            if not (mirror / 'HEAD').exists():
+                self.log(f"Creating cached mirror of {src}...")
+                mirror.parent.mkdir(parents=True, exist_ok=True)
+                result = self._run_git(['clone', '--mirror', '--quiet', src, str(mirror)])
+                if result.returncode != 0:
+                    self.log(f"Could not mirror {src}, cloning directly: {result.stderr}", "WARNING")
+                    shutil.rmtree(mirror, ignore_errors=True)
+                    return False
+                # Export every file, even ones the repo marks export-ignore
+                (mirror / 'info').mkdir(exist_ok=True)
+                (mirror / 'info' / 'attributes').write_text("* -export-ignore -export-subst\n")
+            elif src not in self._fresh_mirrors and not (
+                    self._is_commit_hash(ref)
+                    and self._run_git(['cat-file', '-e', commit], cwd=mirror).returncode == 0):
+                # Branches move; commits already present in the mirror never change
+                self.log(f"Updating cached mirror of {src}...")
+                result = self._run_git(['fetch', '--prune', '--quiet', 'origin'], cwd=mirror)
+                if result.returncode != 0:
+                    self.log(f"Could not update mirror of {src}: {result.stderr}", "WARNING")
+            self._fresh_mirrors.add(src)
+            
+            if self._run_git(['rev-parse', '--verify', '--quiet', commit], cwd=mirror).returncode != 0:
+                if self._is_commit_hash(ref):
+                    self.log(f"Commit {ref} not found in mirror of {src}, cloning directly", "WARNING")
+                    return False
+                self.log(f"Warning: Could not checkout '{ref}', using default branch", "WARNING")
+                ref = 'HEAD'
+            
+            archive = subprocess.Popen(['git', 'archive', '--format=tar', ref], cwd=mirror, env=self.git_env,
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            # Same limit as _run_git; killing git also ends a read blocked on its output
+            timer = threading.Timer(GIT_TIMEOUT, archive.kill)
+            timer.start()
+            error = None
+            try:
+                self._untar(archive.stdout, clone_dir, 'r|')
+            except (tarfile.TarError, OSError) as e:
+                # e.g. a symlink leaving the tree, which the data filter rejects
+                error = e
+            finally:
+                timer.cancel()
+                archive.stdout.close()
+                returncode = archive.wait()
+        
+        if error is not None or returncode != 0:
+            reason = error or f"git archive exited with {returncode}"
+            self.log(f"Could not export {ref} from mirror of {src} ({reason}), cloning directly", "WARNING")
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            clone_dir.mkdir(exist_ok=True)
+            return False
+        return True
+    
+    def _download_tarball(self, src: str, ref: str, clone_dir: Path, subpath: str = '') -> bool:
+        """Fetch a GitHub ref as a codeload tarball and stream it into clone_dir.
+        Returns False (leaving clone_dir empty) when git has to be used instead."""
+        parts = _parse_url(src)
+        if parts.netloc.lower() not in GITHUB_HOSTS:
+            return False
+        
+        path_parts = parts.path.strip('/').split('/')
+        owner = path_parts[0]
+        repo = path_parts[1][:-len('.git')] if path_parts[1].endswith('.git') else path_parts[1]
+        url = CODELOAD_URL.format(owner=owner, repo=repo, ref=quote(ref, safe='/'))
+        
+        self.log(f"Downloading {owner}/{repo}@{ref} as a tarball...")
+        try:
+            with self._stream(url) as response:
+                if response.status_code == 404:
+                    # Private repository or unknown ref; git knows how to handle both
+                    self.log(f"No tarball for {owner}/{repo}@{ref}, cloning with git...")
+                    return False
+                response.raise_for_status()
+                response.raw.decode_content = True
+                if not self._untar(response.raw, clone_dir, 'r|gz', strip_top=True, subpath=subpath,
+                                   stop_on_export_rules=True):
+                    # Files would be missing or have $Format$ placeholders filled in.
+                    # A .gitattributes that is itself export-ignore'd can't be seen here.
+                    self.log(f"{owner}/{repo} uses export-ignore/export-subst, cloning with git...")
+                    shutil.rmtree(clone_dir, ignore_errors=True)
+                    clone_dir.mkdir(exist_ok=True)
+                    return False
+            
+            prefix = _normalize_subpath(subpath)
+            if prefix and not any(not path.is_dir() for path in (clone_dir / prefix).rglob('*')):
+                # Nothing under the subpath: let git clone the full tree, which either finds
+                # it or lets the caller list what the repository does contain
+                self.log(f"No files under '{subpath}' in the {owner}/{repo} tarball, cloning with git...")
+                shutil.rmtree(clone_dir, ignore_errors=True)
+                clone_dir.mkdir(exist_ok=True)
+                return False
+            return True
+        except (requests.RequestException, urllib3.exceptions.HTTPError, tarfile.TarError, OSError) as e:
+            # response.raw raises urllib3's own errors (reset connection, read timeout, bad gzip)
+            self.log(f"Tarball download failed ({e}), cloning with git...")
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            clone_dir.mkdir(exist_ok=True)
+            return False
+    
+    def _untar(self, fileobj, dest_dir: Path, mode: str, strip_top: bool = False, subpath: str = '',
+               stop_on_export_rules: bool = False) -> bool:
+        """Extract a streamed tar archive into dest_dir.
+        strip_top drops the archive's top-level folder; subpath keeps only that subtree.
+        With stop_on_export_rules, returns False at the first .gitattributes using export rules."""
+        prefix = _normalize_subpath(subpath)
+        with tarfile.open(fileobj=fileobj, mode=mode) as tar:
+            for member in tar:
+                if strip_top:
+                    member.name = member.name.partition('/')[2]
+                    if member.islnk():
+                        member.linkname = member.linkname.partition('/')[2]
+                    if not member.name:
+                        continue
+                is_attributes = stop_on_export_rules and member.isfile() and (
+                    member.name == '.gitattributes' or member.name.endswith('/.gitattributes'))
+                if (prefix and member.name != prefix and not member.name.startswith(prefix + '/')
+                        and not is_attributes):
+                    continue
+                
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extract(member, dest_dir, filter='data')
+                else:
+                    tar.extract(member, dest_dir)
+                
+                # Streamed archives can't be re-read, so check the extracted copy
+                if is_attributes and EXPORT_ATTR_RE.search((dest_dir / member.name).read_bytes()):
+                    return False
+        return True
+    
+    def _clone_branch_in_process(self, src: str, ref: str, clone_dir: Path) -> bool:
+        """Shallow-clone a branch with libgit2, avoiding a git process per repository"""
+        # libgit2 has no overall timeout: bound stalled sockets, and abort slow transfers
+        # from the progress callbacks, so a clone can't outlive the git CLI's limit
+        settings = pygit2.settings
+        for option in ('server_connect_timeout', 'server_timeout'):
+            if hasattr(settings, option):
+                setattr(settings, option, GIT_TIMEOUT * 1000)
+        deadline = time.monotonic() + GIT_TIMEOUT
+        cancelled = self._cancelled
+        
+        class DeadlineCallbacks(pygit2.RemoteCallbacks):
+            def transfer_progress(self, stats):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"clone took longer than {GIT_TIMEOUT}s")
+                if cancelled.is_set():
+                    raise InterruptedError("clone cancelled")
+            
+            sideband_progress = transfer_progress
+        
+        try:
+            pygit2.clone_repository(src, str(clone_dir), checkout_branch=ref, depth=1,
+                                    callbacks=DeadlineCallbacks())
+            return True
+        except Exception as e:
+            # Missing branch, unsupported transport, or a pygit2 without shallow clone support
+            self.log(f"In-process clone failed ({e}), falling back to git...")
+            shutil.rmtree(clone_dir, ignore_errors=True)
+            clone_dir.mkdir(exist_ok=True)
+            return False
     
     def _retry_operation(self, operation, max_retries=3, delay=2):
         """Retry an operation with exponential backoff."""
@@ -78,48 +581,305 @@ class TxAdminRecipeProcessor:
                 self.log(f"Retrying in {wait_time} seconds...", "INFO")
                 time.sleep(wait_time)
     
+    def _ensure_dir(self, path: Path):
+        """Create a directory (and its parents) unless this run already did"""
+        # Parallel tasks share the cache; mkdir runs once per directory, so holding
+        # the lock across it costs little and keeps the cache in step with the disk
+        with self._known_dirs_lock:
+            if path in self._known_dirs:
+                return
+            path.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(path)
+            self._known_dirs.update(path.parents)
+    
+    def _forget_dirs(self, path: Path):
+        """Drop a removed directory and everything below it from the created-directory cache"""
+        with self._known_dirs_lock:
+            self._known_dirs = {d for d in self._known_dirs if d != path and path not in d.parents}
+    
+    def _copy_file(self, src: str, dst: str) -> str:
+        """Copy a single file using the cheapest mechanism available.
+        Tries a reflink, then copy_file_range, then sendfile, then a buffered copy."""
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            src_fd = fsrc.fileno()
+            dst_fd = fdst.fileno()
+            size = os.fstat(src_fd).st_size
+            
+            if not self._reflink(src_fd, dst_fd) and not self._kernel_copy(src_fd, dst_fd, size):
+                _copy_stream(fsrc, fdst)
+        
+        # Keep timestamps and permissions like shutil.copy2, so a move looks like a move
+        shutil.copystat(src, dst)
+        return dst
+    
+    def _reflink(self, src_fd: int, dst_fd: int) -> bool:
+        """Try to share the source's data blocks with the destination (copy-on-write filesystems)"""
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            import fcntl
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            return True
+        except (ImportError, OSError):
+            return False
+    
+    def _kernel_copy(self, src_fd: int, dst_fd: int, size: int) -> bool:
+        """Copy data inside the kernel with copy_file_range or sendfile.
+        Returns False if neither is usable for this pair of files."""
+        # Only Linux's sendfile accepts a regular file as the destination (BSDs want a socket)
+        if not sys.platform.startswith('linux'):
+            return False
+        for method in ('copy_file_range', 'sendfile'):
+            if not hasattr(os, method):
+                continue
+            
+            offset = 0
+            try:
+                while offset < size:
+                    if method == 'copy_file_range':
+                        sent = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+                    else:
+                        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                if offset == 0 and size > 0:
+                    # Nothing copied from a non-empty file: the filesystem lacks support (as in CPython)
+                    continue
+                return True
+            except OSError as e:
+                # Unsupported for these files: try the next method, unless data was already written
+                if offset == 0 and e.errno in (errno.ENOSYS, errno.EXDEV, errno.EINVAL,
+                                                errno.EOPNOTSUPP, errno.ENOTSUP):
+                    continue
+                raise
+        return False
+    
+    def _move(self, src_path: Path, dest_path: Path):
+        """Move a file or directory, renaming when possible and copying efficiently across filesystems"""
+        try:
+            os.rename(src_path, dest_path)
+            self._forget_dirs(src_path)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        
+        if src_path.is_symlink():
+            os.symlink(os.readlink(src_path), dest_path)
+            src_path.unlink()
+        elif src_path.is_dir():
+            # overlayfs refuses directory renames with EXDEV but can still hardlink the files
+            if not self._link_tree(src_path, dest_path):
+                self.log(f"Cross-filesystem move, copying {src_path}")
+                shutil.copytree(src_path, dest_path, symlinks=True, copy_function=self._copy_file)
+            shutil.rmtree(src_path)
+        else:
+            try:
+                os.link(src_path, dest_path)
+            except OSError:
+                self.log(f"Cross-filesystem move, copying {src_path}")
+                self._copy_file(str(src_path), str(dest_path))
+            src_path.unlink()
+        self._forget_dirs(src_path)
+    
+    def _link_tree(self, src_path: Path, dest_path: Path) -> bool:
+        """Recreate a directory tree with hardlinks; False if the filesystem can't link"""
+        # Probe with one file first: copytree doesn't stop at the first failed link, so on a
+        # real cross-device move it would rebuild every directory before giving up
+        probe = None
+        for root, _, names in os.walk(src_path):
+            probe = next((os.path.join(root, name) for name in names
+                          if not os.path.islink(os.path.join(root, name))), None)
+            if probe is not None:
+                break
+        if probe is not None:
+            probe_link = dest_path.parent / f".{dest_path.name}.link-probe"
+            try:
+                os.link(probe, probe_link)
+            except OSError:
+                return False
+            os.unlink(probe_link)
+        
+        try:
+            shutil.copytree(src_path, dest_path, symlinks=True, copy_function=os.link)
+            return True
+        except (OSError, shutil.Error):
+            # copytree reports per-file failures together as shutil.Error
+            shutil.rmtree(dest_path, ignore_errors=True)
+            return False
+    
+    def _fast_rmtree(self, path: Path):
+        """Remove a directory tree using the entry types os.scandir already knows,
+        avoiding the per-entry lstat shutil.rmtree does. Falls back to shutil.rmtree on errors."""
+        dirs = []
+        stack = [str(path)]
+        try:
+            while stack:
+                current = stack.pop()
+                dirs.append(current)
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            os.unlink(entry.path)
+            # Directories were collected parents-first, so remove them in reverse
+            for directory in reversed(dirs):
+                os.rmdir(directory)
+        except OSError:
+            shutil.rmtree(path)
+    
+    def _extract_zip(self, zip_ref: zipfile.ZipFile, dest_path: Path,
+                     reopen: Optional[Callable[[], Any]] = None):
+        """Extract every member of an archive, decompressing on a thread pool.
+        zlib releases the GIL while inflating, so threads spread the work over all cores.
+        reopen returns a fresh file object for the archive, giving each worker its own
+        handle; without it workers share zip_ref, whose reads are serialized."""
+        members = []
+        directories = set()
+        for info in zip_ref.infolist():
+            name = self._zip_member_name(info)
+            if not name:
+                continue
+            target = dest_path / name
+            members.append((info, target))
+            directories.add(target if info.is_dir() else target.parent)
+        
+        # Create every target directory up front so workers never race on makedirs
+        for directory in sorted(directories):
+            directory.mkdir(parents=True, exist_ok=True)
+        
+        # A name stored twice is written once, from its last entry, as extractall leaves it;
+        # two workers writing the same target would otherwise race on its contents
+        latest = {target: info for info, target in members if not info.is_dir()}
+        files = [(info, target) for target, info in latest.items()]
+        workers = min(os.cpu_count() or 1, len(files))
+        if len(files) < PARALLEL_EXTRACT_MIN_MEMBERS or workers < 2:
+            for info, target in files:
+                self._extract_member(zip_ref, info, target)
+            return
+        
+        local = threading.local()
+        opened = []
+        opened_lock = threading.Lock()
+        
+        def extract(info: zipfile.ZipInfo, target: Path):
+            handle = getattr(local, 'zip_ref', None)
+            if handle is None:
+                if reopen is None:
+                    handle = zip_ref
+                else:
+                    fileobj = reopen()
+                    handle = zipfile.ZipFile(fileobj, 'r')
+                    with opened_lock:
+                        opened.append((handle, fileobj))
+                local.zip_ref = handle
+            self._extract_member(handle, info, target)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for future in [executor.submit(extract, info, target) for info, target in files]:
+                    future.result()
+        finally:
+            for handle, fileobj in opened:
+                handle.close()
+                fileobj.close()
+    
+    def _extract_member(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, target: Path):
+        """Decompress one archive member to target through the reusable copy buffer"""
+        with zip_ref.open(info) as source, open(target, 'wb') as out:
+            _copy_stream(source, out, ZIP_COPY_BUFFER_SIZE)
+    
+    def _zip_member_name(self, info: zipfile.ZipInfo) -> str:
+        """Relative path a member is extracted to, sanitized the same way zipfile does"""
+        arcname = info.filename.replace('/', os.path.sep)
+        if os.path.altsep:
+            arcname = arcname.replace(os.path.altsep, os.path.sep)
+        arcname = os.path.splitdrive(arcname)[1]
+        invalid_parts = ('', os.path.curdir, os.path.pardir)
+        arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in invalid_parts)
+        if os.path.sep == '\\':
+            # Like ZipFile._sanitize_windows_name: replace illegal characters, drop trailing dots
+            parts = (part.rstrip('.') for part in arcname.translate(WINDOWS_ILLEGAL_NAME_CHARS).split('\\'))
+            arcname = '\\'.join(part for part in parts if part)
+        return arcname
+    
     def cleanup(self):
-        """Clean up temporary directory"""
-        if self.temp_dir and self.temp_dir.exists():
+        """Clean up temporary directory and close pooled HTTP connections"""
+        self.session.close()
+        # Never remove anything outside the output directory
+        if self.temp_dir and self.temp_dir.exists() and self.output_dir in self.temp_dir.parents:
             shutil.rmtree(self.temp_dir)
             self.log(f"Cleaned up temporary directory: {self.temp_dir}")
         elif self.dry_run:
             self.log("No cleanup needed in dry-run mode")
     
+    def _recipe_cache_path(self, digest: str) -> Path:
+        """Cache file for a recipe parsed from content with the given hash"""
+        return RECIPE_CACHE_DIR / f"{digest}.json"
+    
+    def _load_cached_recipe(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Return the recipe previously parsed from identical content, if cached"""
+        try:
+            with open(self._recipe_cache_path(digest), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _save_cached_recipe(self, digest: str, recipe: Dict[str, Any]):
+        """Store the parsed recipe so the next run can skip YAML parsing"""
+        cache_path = self._recipe_cache_path(digest)
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so a concurrent run never reads a partial file
+            partial = cache_path.with_name(f".{cache_path.name}.{os.getpid()}")
+            with open(partial, 'w') as f:
+                json.dump(recipe, f)
+            os.replace(partial, cache_path)
+        except (OSError, TypeError, ValueError) as e:
+            # Not fatal: unwritable cache or values JSON can't represent
+            self.log(f"Could not cache parsed recipe: {e}")
+    
     def load_recipe(self) -> Dict[str, Any]:
         """Load and parse the txAdmin recipe YAML file"""
         try:
-            with open(self.recipe_file, 'r') as f:
+            # Work on raw bytes: the filter is a single regex pass and the YAML parser
+            # decodes bytes itself, so the text is never split or re-joined in Python
+            with open(self.recipe_file, 'rb') as f:
                 content = f.read()
-                # Handle special txAdmin variables (treat them as comments for now)
-                lines = content.split('\n')
-                filtered_lines = []
-                for line in lines:
-                    if not line.strip().startswith('$'):
-                        filtered_lines.append(line)
-                content = '\n'.join(filtered_lines)
-                
-                recipe = yaml.safe_load(content)
-                self.log(f"Loaded recipe: {recipe.get('name', 'Unknown')}")
-                return recipe
+            
+            # Handle special txAdmin variables (treat them as comments for now);
+            # most recipes have none, and a byte search is cheaper than the regex
+            if b'$' in content:
+                content = DOLLAR_LINE_RE.sub(b'', content)
+            
+            digest = hashlib.blake2b(content).hexdigest()
+            recipe = self._load_cached_recipe(digest)
+            if recipe is None:
+                recipe = yaml.load(content, Loader=YamlLoader)
+                self._save_cached_recipe(digest, recipe)
+            else:
+                self.log("Using cached parse of recipe file")
+            
+            self.log(f"Loaded recipe: {recipe.get('name', 'Unknown')}")
+            return recipe
         except Exception as e:
             self.log(f"Failed to load recipe file: {e}", "ERROR")
             sys.exit(1)
     
-    def process_download_github(self, task: Dict[str, Any]) -> bool:
+    def process_download_github(self, task: PlannedTask) -> bool:
         """Process download_github action"""
-        src = task.get('src', '')
-        dest = task.get('dest', '')
-        ref = task.get('ref', 'main')
-        subpath = task.get('subpath', '')
+        src = task.src
+        ref = task.ref
+        subpath = task.subpath
         
-        if not src or not dest:
+        if not src or not task.dest:
             self.log(f"Missing src or dest in download_github task", "WARNING")
             return False
         
-        # Resolve destination path first
-        dest_path = self.output_dir / dest.lstrip('./')
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        dest_path = task.dest_path
+        self._ensure_dir(dest_path.parent)
         
         # Handle placeholder URLs in dry-run mode
         if self.dry_run:
@@ -127,7 +887,7 @@ class TxAdminRecipeProcessor:
             parent_path = self._should_create_in_dry_run(dest_path)
             if parent_path and str(parent_path) != '.':
                 full_parent = self.output_dir / parent_path
-                full_parent.mkdir(parents=True, exist_ok=True)
+                self._ensure_dir(full_parent)
                 self.log(f"Created parent structure: {full_parent}")
             
             # Extract resource name for logging
@@ -140,7 +900,7 @@ class TxAdminRecipeProcessor:
                 self.log(f"  Target location: {dest_path}")
             else:
                 # Try to extract repo info from actual URL
-                parts = urlparse(src)
+                parts = _parse_url(src)
                 path_parts = parts.path.strip('/').split('/')
                 if len(path_parts) >= 2:
                     owner = path_parts[0]
@@ -155,7 +915,7 @@ class TxAdminRecipeProcessor:
             return True
         
         # For actual cloning, validate the URL
-        parts = urlparse(src)
+        parts = _parse_url(src)
         path_parts = parts.path.strip('/').split('/')
         if len(path_parts) < 2 or src == '<GITHUB_URL>':
             self.log(f"Invalid GitHub URL: {src}", "WARNING")
@@ -166,89 +926,61 @@ class TxAdminRecipeProcessor:
         
         self.log(f"Cloning {owner}/{repo} (ref: {ref}) to {dest_path}")
         
-        # Clone the repository
-        temp_clone_dir = self.temp_dir / f"{owner}_{repo}_{ref}"
+        # Without a subpath the whole checkout is kept, so clone straight into a fresh
+        # destination; otherwise use a unique temp dir (parallel clones of one repo can't collide)
+        clone_in_place = not subpath and not dest_path.exists()
+        if not clone_in_place and self._holds_temp_dir(dest_path):
+            self.log(f"Refusing to replace {dest_path}, it holds the working directory {self.temp_dir}", "ERROR")
+            return False
+        clone_dir = None
+        cloned = False
         
         try:
-            # Determine the best cloning strategy based on ref type
-            if self._is_commit_hash(ref):
-                # For commit hashes, clone full repo then checkout
-                self.log(f"Detected commit hash, cloning full repository...")
-                cmd = ['git', 'clone', src, str(temp_clone_dir)]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-                
-                if result.returncode == 0:
-                    # Checkout the specific commit
-                    checkout_result = subprocess.run(
-                        ['git', 'checkout', ref], 
-                        cwd=temp_clone_dir, 
-                        capture_output=True, 
-                        text=True,
-                        timeout=60
-                    )
-                    if checkout_result.returncode != 0:
-                        self.log(f"Failed to checkout {ref}: {checkout_result.stderr}", "ERROR")
-                        return False
+            if clone_in_place:
+                dest_path.mkdir()
+                clone_dir = dest_path
             else:
-                # For branch names, try shallow clone first
-                self.log(f"Attempting shallow clone of branch '{ref}'...")
-                cmd = ['git', 'clone', '--depth', '1', '--branch', ref, src, str(temp_clone_dir)]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-                
-                if result.returncode != 0:
-                    # Fallback: try without branch specification (use default branch)
-                    self.log(f"Shallow clone failed, trying default branch...")
-                    cmd = ['git', 'clone', '--depth', '1', src, str(temp_clone_dir)]
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-                    
-                    if result.returncode == 0 and ref not in ['main', 'master']:
-                        # Try to checkout the ref if it exists
-                        checkout_result = subprocess.run(
-                            ['git', 'checkout', ref], 
-                            cwd=temp_clone_dir, 
-                            capture_output=True, 
-                            text=True,
-                            timeout=60
-                        )
-                        if checkout_result.returncode != 0:
-                            self.log(f"Warning: Could not checkout '{ref}', using default branch", "WARNING")
+                clone_dir = Path(tempfile.mkdtemp(prefix=f"{owner}_{repo}_", dir=self.temp_dir))
             
-            if result.returncode != 0:
-                self.log(f"Failed to clone repository {src}: {result.stderr}", "ERROR")
+            if not self._clone_ref(src, ref, clone_dir, subpath):
                 return False
             
             # Remove .git directory to save space
-            git_dir = temp_clone_dir / '.git'
+            git_dir = clone_dir / '.git'
             if git_dir.exists():
-                shutil.rmtree(git_dir)
+                self._fast_rmtree(git_dir)
             
             # Handle subpath if specified
-            source_dir = temp_clone_dir
+            source_dir = clone_dir
             if subpath:
-                source_dir = temp_clone_dir / subpath
+                source_dir = clone_dir / subpath
                 if not source_dir.exists():
                     self.log(f"Subpath '{subpath}' not found in repository {owner}/{repo}", "ERROR")
                     self.log(f"Available paths in repository:", "INFO")
                     try:
-                        for item in sorted(temp_clone_dir.rglob('*')):
+                        for item in sorted(clone_dir.rglob('*')):
                             if item.is_dir() and not str(item.name).startswith('.'):
-                                rel_path = item.relative_to(temp_clone_dir)
+                                rel_path = item.relative_to(clone_dir)
                                 self.log(f"  {rel_path}", "INFO")
                     except Exception:
                         self.log(f"  Could not list repository contents", "INFO")
                     return False
             
             # Move to destination
-            if dest_path.exists():
-                shutil.rmtree(dest_path)
-            
-            if subpath:
-                # If subpath is specified, copy only that directory's contents
-                shutil.copytree(source_dir, dest_path)
-            else:
-                # Otherwise, move the entire repo
-                shutil.move(str(temp_clone_dir), str(dest_path))
+            if not clone_in_place:
+                if dest_path.exists():
+                    shutil.rmtree(dest_path)
+                    self._forget_dirs(dest_path)
+                
+                if subpath:
+                    # If subpath is specified, keep only that directory and discard the rest
+                    self._move(source_dir, dest_path)
+                    shutil.rmtree(clone_dir)
+                else:
+                    # Otherwise, move the entire repo
+                    self._move(clone_dir, dest_path)
             
+            cloned = True
             self.log(f"Successfully cloned {owner}/{repo} to {dest_path}")
             return True
             
@@ -258,19 +990,29 @@ class TxAdminRecipeProcessor:
         except Exception as e:
             self.log(f"Error processing GitHub download {src}: {e}", "ERROR")
             return False
+        finally:
+            # Don't leave a half-cloned resource behind in the output tree
+            if clone_in_place and not cloned and clone_dir is not None:
+                shutil.rmtree(dest_path, ignore_errors=True)
+                self._forget_dirs(dest_path)
+    
+    def _holds_temp_dir(self, path: Path) -> bool:
+        """Whether removing or replacing path would delete this run's temp directory"""
+        if self.temp_dir is None:
+            return False
+        path = Path(os.path.normpath(path))
+        return path == self.temp_dir or path in self.temp_dir.parents
     
-    def process_download_file(self, task: Dict[str, Any]) -> bool:
+    def process_download_file(self, task: PlannedTask) -> bool:
         """Process download_file action"""
-        url = task.get('url', '')
-        path = task.get('path', '')
+        url = task.url
         
-        if not url or not path:
+        if not url or not task.path:
             self.log(f"Missing url or path in download_file task", "WARNING")
             return False
         
-        # Resolve destination path
-        dest_path = self.output_dir / path.lstrip('./')
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        dest_path = task.target_path
+        self._ensure_dir(dest_path.parent)
         
         if self.dry_run:
             # In dry-run mode, just create the parent directory
@@ -278,38 +1020,45 @@ class TxAdminRecipeProcessor:
             return True
         
         self.log(f"Downloading {url} to {dest_path}")
+        opened = False
+        downloaded = False
         
         try:
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            with open(dest_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            with self._stream(url) as response:
+                response.raise_for_status()
+                # Let urllib3 undo any Content-Encoding, then copy in large blocks
+                response.raw.decode_content = True
+                with open(dest_path, 'wb', buffering=COPY_BUFFER_SIZE) as f:
+                    opened = True
+                    self._copy_response(response, f)
             
+            downloaded = True
             self.log(f"Successfully downloaded {url}")
             return True
             
         except Exception as e:
             self.log(f"Error downloading file: {e}", "ERROR")
             return False
+        finally:
+            # Don't leave a truncated file behind for later tasks to pick up
+            if opened and not downloaded:
+                try:
+                    dest_path.unlink()
+                except OSError:
+                    pass
     
-    def process_unzip(self, task: Dict[str, Any]) -> bool:
+    def process_unzip(self, task: PlannedTask) -> bool:
         """Process unzip action"""
-        src = task.get('src', '')
-        dest = task.get('dest', '')
-        
-        if not src or not dest:
+        if not task.src or not task.dest:
             self.log(f"Missing src or dest in unzip task", "WARNING")
             return False
         
-        # Resolve paths
-        src_path = self.output_dir / src.lstrip('./')
-        dest_path = self.output_dir / dest.lstrip('./')
+        src_path = task.src_path
+        dest_path = task.dest_path
         
         if self.dry_run:
             # In dry-run mode, just create the destination directory
-            dest_path.mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(dest_path)
             self.log(f"Would extract {src_path} to {dest_path}")
             return True
         
@@ -317,13 +1066,18 @@ class TxAdminRecipeProcessor:
             self.log(f"Source zip file not found: {src_path}", "WARNING")
             return False
         
-        dest_path.mkdir(parents=True, exist_ok=True)
+        self._ensure_dir(dest_path)
         
         self.log(f"Extracting {src_path} to {dest_path}")
         
         try:
-            with zipfile.ZipFile(src_path, 'r') as zip_ref:
-                zip_ref.extractall(dest_path)
+            # Map the archive once: header and member reads become page-cache lookups
+            # instead of read syscalls, and every worker reads the same mapping
+            with open(src_path, 'rb') as archive, \
+                    mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                    _MappedReader(mapped) as reader, \
+                    zipfile.ZipFile(reader, 'r') as zip_ref:
+                self._extract_zip(zip_ref, dest_path, reopen=lambda: _MappedReader(mapped))
             
             self.log(f"Successfully extracted {src_path}")
             return True
@@ -332,23 +1086,115 @@ class TxAdminRecipeProcessor:
             self.log(f"Error extracting zip file: {e}", "ERROR")
             return False
     
-    def process_move_path(self, task: Dict[str, Any]) -> bool:
+    def process_download_unzip(self, task: PlannedTask) -> bool:
+        """Process a download_file fused with the unzip of the same archive.
+        The archive is streamed into memory or a temp file instead of the output tree."""
+        if self.dry_run:
+            return self.process_download_file(task) and self.process_unzip(task)
+        
+        url = task.url
+        archive_path = task.target_path
+        dest_path = task.dest_path
+        
+        # Keep the folder the archive would have been written to
+        self._ensure_dir(archive_path.parent)
+        created_dest = not dest_path.exists()
+        self._ensure_dir(dest_path)
+        extracted = False
+        
+        self.log(f"Downloading and extracting {url} to {dest_path}")
+        
+        try:
+            with self._stream(url) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                with self._archive_buffer(response) as spool:
+                    self._copy_response(response, spool)
+                    spool.seek(0)
+                    with zipfile.ZipFile(spool, 'r') as zip_ref:
+                        self._extract_zip(zip_ref, dest_path)
+            
+            extracted = True
+            self.log(f"Successfully downloaded and extracted {url}")
+            return True
+            
+        except Exception as e:
+            self.log(f"Error downloading and extracting archive: {e}", "ERROR")
+            return False
+        finally:
+            # Extraction creates the member directories first; don't leave that hollow tree
+            # for later tasks to move around as if the archive had been unpacked
+            if created_dest and not extracted:
+                shutil.rmtree(dest_path, ignore_errors=True)
+                self._forget_dirs(dest_path)
+    
+    @contextlib.contextmanager
+    def _stream(self, url: str):
+        """GET url as a stream that _cancel_downloads can break off mid-transfer"""
+        with self.session.get(url, stream=True, timeout=30) as response:
+            with self._responses_lock:
+                if self._cancelled.is_set():
+                    raise InterruptedError("download cancelled")
+                self._responses.add(response)
+            try:
+                yield response
+            finally:
+                with self._responses_lock:
+                    self._responses.discard(response)
+    
+    def _copy_response(self, response: requests.Response, dst):
+        """Copy a streamed body in large blocks, giving up once the run is cancelled.
+        read()-based: urllib3 1.x readinto() breaks on compressed bodies."""
+        while True:
+            block = response.raw.read(COPY_BUFFER_SIZE)
+            # A socket shut down by _cancel_downloads can read as a clean end of body
+            if self._cancelled.is_set():
+                raise InterruptedError("download cancelled")
+            if not block:
+                break
+            dst.write(block)
+    
+    def _cancel_downloads(self):
+        """Cancel the run: shut down the sockets of in-flight downloads so their
+        blocked reads return now instead of when the transfer finishes"""
+        with self._responses_lock:
+            self._cancelled.set()
+            responses = list(self._responses)
+        for response in responses:
+            sock = getattr(response.raw.connection, 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.session.close()
+    
+    def _archive_buffer(self, response: requests.Response):
+        """Seekable buffer for a downloaded archive: memory when the response says it is
+        small, otherwise a temp file. (SpooledTemporaryFile lacks seekable() before
+        Python 3.11, which ZipFile needs.)"""
+        try:
+            size = int(response.headers.get('Content-Length', 0))
+        except ValueError:
+            size = 0
+        if 0 < size <= SPOOL_MAX_SIZE:
+            return io.BytesIO()
+        return tempfile.TemporaryFile(dir=self.temp_dir)
+    
+    def process_move_path(self, task: PlannedTask) -> bool:
         """Process move_path action"""
-        src = task.get('src', '')
-        dest = task.get('dest', '')
-        overwrite = task.get('overwrite', False)
+        overwrite = task.overwrite
         
-        if not src or not dest:
+        if not task.src or not task.dest:
             self.log(f"Missing src or dest in move_path task", "WARNING")
             return False
         
-        # Resolve paths
-        src_path = self.output_dir / src.lstrip('./')
-        dest_path = self.output_dir / dest.lstrip('./')
+        src_path = task.src_path
+        dest_path = task.dest_path
         
         if self.dry_run:
             # In dry-run mode, just create the destination directory structure
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            self._ensure_dir(dest_path.parent)
             overwrite_info = " (overwrite)" if overwrite else ""
             self.log(f"Would move {src_path} to {dest_path}{overwrite_info}")
             return True
@@ -357,22 +1203,28 @@ class TxAdminRecipeProcessor:
             self.log(f"Source path not found: {src_path}", "WARNING")
             return False
         
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        self._ensure_dir(dest_path.parent)
         
         self.log(f"Moving {src_path} to {dest_path}")
         
+        if self._holds_temp_dir(src_path) or (overwrite and self._holds_temp_dir(dest_path)):
+            self.log(f"Refusing to move {src_path} to {dest_path}, it would take the working directory "
+                     f"{self.temp_dir} with it", "ERROR")
+            return False
+        
         try:
             if dest_path.exists():
                 if overwrite:
                     if dest_path.is_dir():
                         shutil.rmtree(dest_path)
+                        self._forget_dirs(dest_path)
                     else:
                         dest_path.unlink()
                 else:
                     self.log(f"Destination already exists and overwrite is False: {dest_path}", "WARNING")
                     return False
             
-            shutil.move(str(src_path), str(dest_path))
+            self._move(src_path, dest_path)
             self.log(f"Successfully moved {src_path} to {dest_path}")
             return True
             
@@ -380,16 +1232,13 @@ class TxAdminRecipeProcessor:
             self.log(f"Error moving path: {e}", "ERROR")
             return False
     
-    def process_remove_path(self, task: Dict[str, Any]) -> bool:
+    def process_remove_path(self, task: PlannedTask) -> bool:
         """Process remove_path action"""
-        path = task.get('path', '')
-        
-        if not path:
+        if not task.path:
             self.log(f"Missing path in remove_path task", "WARNING")
             return False
         
-        # Resolve path
-        target_path = self.output_dir / path.lstrip('./')
+        target_path = task.target_path
         
         if self.dry_run:
             # In dry-run mode, just log what would be removed
@@ -400,11 +1249,16 @@ class TxAdminRecipeProcessor:
             self.log(f"Path to remove not found: {target_path}", "WARNING")
             return True  # Not an error if it doesn't exist
         
+        if self._holds_temp_dir(target_path):
+            self.log(f"Refusing to remove {target_path}, it holds the working directory {self.temp_dir}", "ERROR")
+            return False
+        
         self.log(f"Removing {target_path}")
         
         try:
             if target_path.is_dir():
                 shutil.rmtree(target_path)
+                self._forget_dirs(target_path)
             else:
                 target_path.unlink()
             
@@ -415,47 +1269,253 @@ class TxAdminRecipeProcessor:
             self.log(f"Error removing path: {e}", "ERROR")
             return False
     
-    def process_waste_time(self, task: Dict[str, Any]) -> bool:
+    def process_waste_time(self, task: PlannedTask) -> bool:
         """Process waste_time action (throttling)"""
-        seconds = task.get('seconds', 0)
+        seconds = task.seconds
         
         if seconds > 0:
             if self.dry_run:
                 self.log(f"Would wait {seconds} seconds (throttling)")
             else:
-                self.log(f"Waiting {seconds} seconds (throttling)...")
-                time.sleep(seconds)
+                # Time already spent since the last download counts towards the wait
+                elapsed = time.monotonic() - self._last_throttled_action
+                remaining = seconds - elapsed
+                if remaining > 0:
+                    self.log(f"Waiting {remaining:.1f} of {seconds} seconds (throttling)...")
+                    if self._cancelled.wait(remaining):
+                        return False
+                else:
+                    self.log(f"Skipping {seconds} second wait, last download finished {elapsed:.1f}s ago")
         
         return True
     
-    def process_task(self, task: Dict[str, Any]) -> bool:
+    def process_task(self, task: PlannedTask) -> bool:
         """Process a single task based on its action type"""
-        action = task.get('action', '')
+        action = task.action
+        handler = self._action_map.get(action, self._unknown_action)
+        if action not in self.PARALLEL_ACTIONS:
+            return handler(task)
+        try:
+            return handler(task)
+        finally:
+            self._last_throttled_action = time.monotonic()
+    
+    def _unknown_action(self, task: PlannedTask) -> bool:
+        """Fallback processor for unsupported actions"""
+        self.log(f"Unknown action type: {task.action}", "WARNING")
+        return False
+    
+    def _plan_task(self, task: Dict[str, Any]) -> PlannedTask:
+        """Read a recipe task's fields once and resolve the output paths it names"""
+        def text(key: str, default: str = '') -> str:
+            value = task.get(key)
+            return default if value is None else str(value)
         
-        # Skip database-related actions
-        if action in ['connect_database', 'query_database']:
-            self.log(f"Skipping database action: {action}")
-            return True
+        def resolve(value: str) -> Optional[Path]:
+            return self.output_dir / value.lstrip('./') if value else None
         
-        # Map actions to their processors
-        action_map = {
-            'download_github': self.process_download_github,
-            'download_file': self.process_download_file,
-            'unzip': self.process_unzip,
-            'move_path': self.process_move_path,
-            'remove_path': self.process_remove_path,
-            'waste_time': self.process_waste_time,
-        }
+        planned = PlannedTask(
+            action=text('action'),
+            src=text('src'),
+            dest=text('dest'),
+            path=text('path'),
+            url=text('url'),
+            ref=text('ref', 'main'),
+            subpath=_normalize_subpath(text('subpath')),
+            overwrite=bool(task.get('overwrite', False)),
+            seconds=task.get('seconds', 0),
+        )
+        # download_github's src is a URL, not a local path
+        if planned.action != 'download_github':
+            planned.src_path = resolve(planned.src)
+        planned.dest_path = resolve(planned.dest)
+        planned.target_path = resolve(planned.path)
+        return planned
+    
+    def _fuse_download_unzip(self, tasks: List[PlannedTask]) -> List[PlannedTask]:
+        """Merge each download_file with the later unzip of the same file into a single
+        download_unzip task, placed where the unzip was. Only done when no other task
+        touches the archive and no waste_time sits between them."""
+        references = Counter(
+            path
+            for task in tasks
+            for path in (task.src_path, task.dest_path, task.target_path)
+        )
         
-        processor = action_map.get(action)
-        if processor:
-            return processor(task)
-        else:
-            self.log(f"Unknown action type: {action}", "WARNING")
+        fused_at = {}
+        downloads = set()
+        for i, task in enumerate(tasks):
+            if task.action != 'download_file' or not task.url:
+                continue
+            archive = task.target_path
+            if archive is None or references[archive] != 2:
+                continue
+            
+            for j in range(i + 1, len(tasks)):
+                following = tasks[j]
+                if following.action == 'unzip' and following.src_path == archive:
+                    if following.dest:
+                        self.log(f"Streaming {task.path} straight into extraction")
+                        fused_at[j] = dataclasses.replace(following, action='download_unzip', url=task.url,
+                                                          path=task.path, target_path=archive)
+                        downloads.add(i)
+                    break
+                reads, writes = self._task_access(following)
+                if (following.action == 'waste_time'
+                        or any(self._paths_overlap(archive, path) for path in reads + writes)):
+                    break
+        
+        return [fused_at.get(i, task) for i, task in enumerate(tasks) if i not in downloads]
+    
+    def _task_access(self, task: PlannedTask) -> Tuple[List[Path], List[Path]]:
+        """The output paths a task reads and the ones it writes (or removes)"""
+        def present(*paths: Optional[Path]) -> List[Path]:
+            return [path for path in paths if path is not None]
+        
+        if task.action == 'unzip':
+            return present(task.src_path), present(task.dest_path)
+        # move_path's source disappears, so moving counts as writing it
+        return [], present(task.src_path, task.dest_path, task.target_path)
+    
+    def _paths_overlap(self, a: Path, b: Path) -> bool:
+        """Check if one path is equal to or nested inside the other"""
+        return a == b or a in b.parents or b in a.parents
+    
+    def _plan_dependencies(self, tasks: List[PlannedTask]) -> List[Set[int]]:
+        """For each task, the earlier tasks that must finish before it may start.
+        A task waits for earlier ones that write a path it touches, or touch a path it
+        writes; tasks that only read the same path may overlap. waste_time is a barrier."""
+        access = [self._task_access(task) for task in tasks]
+        dependencies = []
+        barrier = None
+        
+        for i, task in enumerate(tasks):
+            start = 0 if barrier is None else barrier
+            if task.action == 'waste_time':
+                # Everything since the previous barrier has to finish first
+                task_deps = set(range(start, i))
+                barrier = i
+            else:
+                reads, writes = access[i]
+                touched = reads + writes
+                task_deps = set() if barrier is None else {barrier}
+                for j in range(start, i):
+                    earlier_reads, earlier_writes = access[j]
+                    if (any(self._paths_overlap(a, b) for a in touched for b in earlier_writes)
+                            or any(self._paths_overlap(a, b) for a in writes for b in earlier_reads)):
+                        task_deps.add(j)
+            dependencies.append(task_deps)
+        
+        return dependencies
+    
+    def _task_header(self, i: int, total_tasks: int, task: PlannedTask, label: str = "Processing") -> str:
+        """Build the progress header printed for a task"""
+        action = task.action or 'unknown'
+        dest = task.dest or task.path or 'unknown'
+        progress_percent = round((i / total_tasks) * 100)
+        header = f"\n[{i}/{total_tasks}] ({progress_percent}%) {label}: {action}"
+        if dest != 'unknown':
+            header += f"\n  → {dest}"
+        return header
+    
+    def _run_after(self, i: int, task: PlannedTask, dependencies: Set[int],
+                   done: List[threading.Event]) -> bool:
+        """Wait for a task's dependencies, then process it"""
+        try:
+            for j in dependencies:
+                done[j].wait()
+            if self._cancelled.is_set():
+                return False
+            return self.process_task(task)
+        except Exception as e:
+            self.log(f"Unexpected error in task {i + 1}: {e}", "ERROR")
             return False
+        finally:
+            done[i].set()
+    
+    def _flush_progress(self, lines: List[str]):
+        """Write queued progress lines in one call, without interleaving with log output"""
+        if not lines:
+            return
+        with self._log_lock:
+            sys.stdout.write(''.join(lines))
+            sys.stdout.flush()
+        lines.clear()
+    
+    def _run_pipeline(self, tasks: List[PlannedTask]) -> Tuple[int, int]:
+        """Run tasks as a pipeline of network, extraction and ordered stages.
+        Downloads and unzips go to their own worker pools as soon as the tasks they depend
+        on finish, while move/remove/wait steps run one at a time in recipe order, so
+        extracting an earlier archive overlaps with later downloads."""
+        dependencies = self._plan_dependencies(tasks)
+        done = [threading.Event() for _ in tasks]
+        total_tasks = len(tasks)
+        successful = 0
+        failed = 0
+        
+        # Tasks are submitted in recipe order and only wait on earlier ones, so no
+        # FIFO pool can fill up with tasks waiting on work queued behind them
+        with ThreadPoolExecutor(max_workers=self.jobs) as download_pool, \
+                ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as extract_pool, \
+                ThreadPoolExecutor(max_workers=1) as ordered_pool:
+            futures = {}
+            for i, task in enumerate(tasks):
+                action = task.action
+                if action in self.PARALLEL_ACTIONS:
+                    pool = download_pool
+                elif action in self.EXTRACT_ACTIONS:
+                    pool = extract_pool
+                else:
+                    pool = ordered_pool
+                futures[pool.submit(self._run_after, i, task, dependencies[i], done)] = i
+            
+            progress: List[str] = []
+            last_flush = time.monotonic()
+            try:
+                pending = set(futures)
+                while pending:
+                    finished, pending = wait(pending, timeout=PROGRESS_FLUSH_INTERVAL,
+                                             return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        i = futures[future]
+                        ok = future.result()
+                        if ok:
+                            successful += 1
+                        else:
+                            failed += 1
+                        # Tasks finish out of recipe order, so count completions instead
+                        completed = successful + failed
+                        progress.append(self._task_header(completed, total_tasks, tasks[i], "Finished") + "\n")
+                        progress.append("✓ Success\n" if ok else "✗ Failed\n")
+                    
+                    if (len(progress) >= PROGRESS_FLUSH_LINES
+                            or time.monotonic() - last_flush >= PROGRESS_FLUSH_INTERVAL):
+                        self._flush_progress(progress)
+                        last_flush = time.monotonic()
+            except BaseException:
+                # Let queued tasks drain without running so the pools can shut down
+                self._cancel_downloads()
+                for future in futures:
+                    future.cancel()
+                for event in done:
+                    event.set()
+                raise
+            finally:
+                self._flush_progress(progress)
+        
+        return successful, failed
     
     def process(self):
         """Main processing function"""
+        # The temp dir lives in the output tree, so remove it however processing ends
+        # (early return, sys.exit from load_recipe, errors or Ctrl+C)
+        try:
+            self._process_recipe()
+        finally:
+            self.cleanup()
+    
+    def _process_recipe(self):
+        """Load the recipe and run its tasks"""
         recipe = self.load_recipe()
         
         tasks = recipe.get('tasks', [])
@@ -463,10 +1523,23 @@ class TxAdminRecipeProcessor:
             self.log("No tasks found in recipe", "WARNING")
             return
         
+        # Drop commented tasks (None value from YAML) and skipped actions up front,
+        # then read each remaining task once so handlers get resolved paths
+        skipped = 0
+        runnable = []
+        for task in tasks:
+            if task is None:
+                skipped += 1
+            elif task.get('action') in self.SKIPPED_ACTIONS:
+                self.log(f"Skipping database action: {task['action']}")
+                skipped += 1
+            else:
+                runnable.append(self._plan_task(task))
+        
+        tasks = self._fuse_download_unzip(runnable)
         total_tasks = len(tasks)
         successful = 0
         failed = 0
-        skipped = 0
         
         mode_text = "DRY-RUN MODE: Creating folder structure" if self.dry_run else "Processing"
         print(f"\n{mode_text} for {total_tasks} tasks...")
@@ -477,32 +1550,22 @@ class TxAdminRecipeProcessor:
             print("Resource folders will be created during actual clone operations")
             print("=" * 60)
         
-        for i, task in enumerate(tasks, 1):
-            # Check if task is commented (None value from YAML)
-            if task is None:
-                skipped += 1
-                continue
-            
-            action = task.get('action', 'unknown')
-            dest = task.get('dest', task.get('path', 'unknown'))
-            progress_percent = round((i / total_tasks) * 100)
-            print(f"\n[{i}/{total_tasks}] ({progress_percent}%) Processing: {action}")
-            if dest != 'unknown':
-                print(f"  → {dest}")
-            
-            if self.process_task(task):
-                successful += 1
-                print(f"✓ Success")
-            else:
-                failed += 1
-                print(f"✗ Failed")
+        if self.jobs > 1:
+            successful, failed = self._run_pipeline(tasks)
+        else:
+            for i, task in enumerate(tasks, 1):
+                print(self._task_header(i, total_tasks, task))
+                
+                if self.process_task(task):
+                    successful += 1
+                    print(f"✓ Success")
+                else:
+                    failed += 1
+                    print(f"✗ Failed")
         
         print("\n" + "=" * 60)
         print(f"Results: {successful} successful, {failed} failed, {skipped} skipped")
         print(f"Output directory: {self.output_dir}")
-        
-        # Cleanup
-        self.cleanup()
 
 def main():
     parser = argparse.ArgumentParser(description='Process txAdmin recipe files')
@@ -514,6 +1577,10 @@ def main():
                         help='Enable verbose output')
     parser.add_argument('--dry-run', action='store_true',
                         help='Create folder structure without cloning repositories')
+    parser.add_argument('-j', '--jobs', type=int, default=8,
+                        help='Number of downloads to run in parallel (default: 8)')
+    parser.add_argument('--mirror-cache', action='store_true',
+                        help=f'Keep bare mirrors of cloned repositories in {MIRROR_DIR} for faster re-runs')
     
     args = parser.parse_args()
     
@@ -521,17 +1588,16 @@ def main():
         print(f"Error: Recipe file not found: {args.recipe}")
         sys.exit(1)
     
-    processor = TxAdminRecipeProcessor(args.recipe, args.output, args.verbose, args.dry_run)
+    processor = TxAdminRecipeProcessor(args.recipe, args.output, args.verbose, args.dry_run, args.jobs,
+                                       args.mirror_cache)
     
     try:
         processor.process()
     except KeyboardInterrupt:
         print("\n\nInterrupted by user")
-        processor.cleanup()
         sys.exit(1)
     except Exception as e:
         print(f"\nError: {e}")
-        processor.cleanup()
         sys.exit(1)
 
 if __name__ == "__main__":